@@ -1,4 +1,5 @@
-from aqt import mw
+from aqt import mw, gui_hooks, dialogs
+from anki import hooks as anki_hooks
 from aqt.qt import (
     QAction,
     QDialog,
@@ -16,15 +17,23 @@ from aqt.qt import (
     QGroupBox,
     QAbstractItemView,
     QTreeWidget,
-    QTreeWidgetItem
+    QTreeWidgetItem,
+    QLineEdit,
+    QCompleter,
+    QStringListModel
 )
 from aqt.utils import tooltip
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtWidgets import QFileDialog, QSizePolicy, QRadioButton, QFrame, QScrollArea
 import random
 import os
 import json
 import re
+import time
+import heapq
+import unicodedata
+from html import unescape
+from array import array
 from functools import partial
 from typing import Final
 
@@ -32,6 +41,19 @@ MENU_WIDTH: Final = 550
 MENU_HEIGHT: Final = 858
 QUESTIONS_WIDTH: Final = 900
 QUESTIONS_HEIGHT: Final = 758
+ANALYTICS_WIDTH: Final = 600
+ANALYTICS_HEIGHT: Final = 500
+MAX_WRONG_OPTIONS_TRACKED: Final = 10
+NGRAM_SIZE: Final = 3
+MAX_SUGGESTIONS: Final = 3
+LEADING_ARTICLES: Final = ("the", "a", "an")
+SQL_CHUNK: Final = 5000
+DECK_TREE_HEIGHT: Final = 160
+MAX_TAG_COMPLETIONS: Final = 20
+MAX_DISTRACTOR_PAIRS: Final = 50000
+DISTRACTOR_RETIRE_AFTER: Final = 5
+SETTINGS_WRITE_DELAY_MS: Final = 1500
+GROUP_BOX_STYLE: Final = "border: 2px solid {color}; border-radius: 10px; margin-top: 10px; padding: 10px;"
 
 # ---- Cross-version helpers ----
 def _deck_tuple(dni):
@@ -49,21 +71,14 @@ def _get_all_decks():
         items = mw.col.decks.allNamesAndIds()
     return [_deck_tuple(d) for d in items]
 
-def _note_type_obj(note):
+def _model_name(model_obj):
     try:
-        return note.note_type()  # New API
-    except Exception:
-        return note.model()      # Old API
-
-def _note_type_name(note):
-    nt = _note_type_obj(note)
-    try:
-        return nt.name
+        return model_obj.name
     except Exception:
         try:
-            return nt["name"]
+            return model_obj["name"]
         except Exception:
-            return str(nt)
+            return str(model_obj)
 
 def _field_names_for_model(model_obj):
     try:
@@ -75,8 +90,20 @@ def _field_names_for_model(model_obj):
     except Exception:
         return []
 
-def _find_notes_in_deck(self, deck_name, exclude_tags):
-    tag_filter = " ".join(f'-tag:"{t}"' for t in exclude_tags if t)
+def _ids_sql(ids):
+    return "(" + ",".join(str(int(i)) for i in ids) + ")"
+
+def _chunks(seq, size=SQL_CHUNK):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+def _find_notes_in_decks(self, deck_ids):
+    """All selected decks are resolved in one search via a did: list (subdecks are passed explicitly).
+
+    Tag exclusion is not part of the query; see TagIndex.note_ids.
+    """
+    if not deck_ids:
+        return []
     state_filter = ""
     
     states = []
@@ -93,26 +120,35 @@ def _find_notes_in_deck(self, deck_name, exclude_tags):
     if len(state_filter) > 0:
         state_filter = "(" + state_filter + ")"
         
-    filters = " ".join([tag_filter, state_filter]).strip()
-    query = f'deck:"{deck_name}" {filters}'.strip()
+    deck_filter = "did:" + ",".join(str(int(d)) for d in deck_ids)
+    query = f'{deck_filter} {state_filter}'.strip()
     return mw.col.find_notes(query)
 
+def _note_source_decks(nids, deck_ids):
+    """Map nid -> source deck id in one pass over the selected decks' cards.
+
+    Cards sitting in a filtered deck are attributed to their original deck.
+    """
+    wanted = set(nids)
+    dids = _ids_sql(deck_ids)
+    res = {}
+    rows = mw.col.db.all(f"select nid, (case when odid then odid else did end) from cards where did in {dids} or odid in {dids}")
+    for nid, did in rows:
+        if nid in wanted and nid not in res:
+            res[nid] = did
+    return res
+
 def _collect_models_and_fields(nids):
     """Return mapping: model_name -> (model_obj, field_names)."""
+    mids = set()
+    for chunk in _chunks(list(nids)):
+        mids.update(mw.col.db.list(f"select distinct mid from notes where id in {_ids_sql(chunk)}"))
     res = {}
-    for nid in nids:
-        n = mw.col.get_note(nid)
-        if not n:
-            continue
-        mobj = _note_type_obj(n)
-        try:
-            mname = mobj.name
-        except Exception:
-            mname = mobj.get("name") if isinstance(mobj, dict) else str(mobj)
-        if mname in res:
+    for mid in mids:
+        mobj = mw.col.models.get(mid)
+        if not mobj:
             continue
-        fields = _field_names_for_model(mobj)
-        res[mname] = (mobj, fields)
+        res[_model_name(mobj)] = (mobj, _field_names_for_model(mobj))
     return res
 
 def _strip_html(text: str) -> str:
@@ -126,56 +162,602 @@ def _normalize_html(s: str) -> str:
     s = re.sub(r"\s+", " ", s)
     return s
 
-def _notes_to_qa(notes, prompt_field, answer_field, required_model_name=None):
+def _text_key(s: str) -> str:
+    """Hash key for prompts and answers: visible text plus image sources, normalized like _normalize_html.
+
+    Keeping the image sources stops image-only fields from all collapsing to the same empty key;
+    anything else with no visible text falls back to its normalized markup.
+    """
+    key = _normalize_html(unescape(_strip_html(s)))
+    images = re.findall(r"<img\b[^>]*?\bsrc\s*=\s*[\"']?([^\"'\s>]+)", s or "", flags=re.IGNORECASE)
+    if images:
+        key = " ".join([key] + images).strip()
+    return key or _normalize_html(s)
+
+# ---- Typed-answer grading ----
+def _canonical_answer(s: str) -> str:
+    """Canonical form for typed grading: no HTML, Latin accents, case, extra spaces or leading article.
+
+    Punctuation and symbols are kept, so "C#" and "C++" stay different answers; accents are only
+    folded on Latin letters so marks that change a letter elsewhere (e.g. kana voicing) still count.
+    """
+    text = unicodedata.normalize("NFKC", unescape(_strip_html(s)))
+    folded = []
+    for c in text:
+        parts = unicodedata.normalize("NFD", c)
+        if len(parts) > 1 and unicodedata.name(parts[0], "").startswith("LATIN"):
+            c = "".join(p for p in parts if not unicodedata.combining(p))
+        folded.append(c)
+    words = "".join(folded).casefold().split()
+    if len(words) > 1 and words[0] in LEADING_ARTICLES:
+        words = words[1:]
+    return " ".join(words)
+
+def _bounded_edit_distance(a: str, b: str, max_dist: int) -> int:
+    """Levenshtein distance between a and b, or max_dist + 1 once it is known to be larger.
+
+    Only the diagonal band of width 2 * max_dist + 1 is computed and the loop exits as soon as a
+    whole row exceeds the bound, so cost is O(len * max_dist) rather than O(len(a) * len(b)).
+    """
+    if a == b:
+        return 0
+    over = max_dist + 1
+    if abs(len(a) - len(b)) > max_dist:
+        return over
+    if len(a) > len(b):
+        a, b = b, a
+    lb = len(b)
+    prev = [j if j <= max_dist else over for j in range(lb + 1)]
+    cur = [over] * (lb + 1)
+    for i in range(1, len(a) + 1):
+        lo = max(1, i - max_dist)
+        hi = min(lb, i + max_dist)
+        cur[lo - 1] = i if lo == 1 and i <= max_dist else over
+        row_min = cur[lo - 1]
+        ca = a[i - 1]
+        for j in range(lo, hi + 1):
+            v = prev[j - 1] + (ca != b[j - 1])
+            if prev[j] + 1 < v:
+                v = prev[j] + 1
+            if cur[j - 1] + 1 < v:
+                v = cur[j - 1] + 1
+            if v > over:
+                v = over
+            cur[j] = v
+            if v < row_min:
+                row_min = v
+        if row_min > max_dist:
+            return over
+        if hi < lb:
+            cur[hi + 1] = over
+        prev, cur = cur, prev
+    return min(prev[lb], over)
+
+def _typed_allowance(canonical_correct: str, max_distance: int, max_ratio: float) -> int:
+    return max(0, min(int(max_distance), int(len(canonical_correct) * float(max_ratio))))
+
+def _grade_typed(typed: str, correct: str, max_distance: int, max_ratio: float):
+    """Return (accepted, distance) for a typed answer against the canonical correct answer."""
+    want = _canonical_answer(correct)
+    if not want:
+        # nothing left to compare loosely (e.g. image-only answer): only an exact match counts
+        return typed.strip() == correct.strip(), None
+    got = _canonical_answer(typed)
+    if not got:
+        return False, None
+    allowed = _typed_allowance(want, max_distance, max_ratio)
+    dist = _bounded_edit_distance(got, want, allowed)
+    return dist <= allowed, dist
+
+def _ngrams(text: str):
+    padded = f" {text} "
+    return {padded[i:i + NGRAM_SIZE] for i in range(max(1, len(padded) - NGRAM_SIZE + 1))}
+
+class NgramIndex:
+    """Character n-gram index over a deck's canonical answers for "did you mean" lookups."""
+
+    def __init__(self, answers):
+        self.entries = []   # answer id -> (canonical, raw html)
+        self.postings = {}  # n-gram -> list of answer ids
+        seen = set()
+        for raw in answers:
+            canon = _canonical_answer(raw)
+            if not canon or canon in seen:
+                continue
+            seen.add(canon)
+            aid = len(self.entries)
+            self.entries.append((canon, raw))
+            for g in _ngrams(canon):
+                self.postings.setdefault(g, []).append(aid)
+
+    def suggest(self, typed: str, max_distance: int, limit: int = MAX_SUGGESTIONS):
+        """Raw answers closest to typed: rank by shared n-grams, then verify with a bounded distance."""
+        canon = _canonical_answer(typed)
+        if not canon:
+            return []
+        shared = {}
+        for g in _ngrams(canon):
+            for aid in self.postings.get(g, ()):
+                shared[aid] = shared.get(aid, 0) + 1
+        bound = max(int(max_distance), len(canon) // 3)
+        scored = []
+        for aid in heapq.nlargest(limit * 5, shared, key=shared.get):
+            dist = _bounded_edit_distance(canon, self.entries[aid][0], bound)
+            if dist <= bound:
+                scored.append((dist, aid))
+        scored.sort()
+        return [self.entries[aid][1] for _dist, aid in scored[:limit]]
+
+def _field_layout(mid, prompt_field, answer_field):
+    """(model name, prompt index, answer index) for a note type, or None if it lacks either field."""
+    mobj = mw.col.models.get(mid)
+    if not mobj:
+        return None
+    fields = _field_names_for_model(mobj)
+    if prompt_field not in fields or answer_field not in fields:
+        return None
+    return (_model_name(mobj), fields.index(prompt_field), fields.index(answer_field))
+
+def _notes_to_qa(notes, prompt_field, answer_field, required_model_name=None, note_decks=None, deck_names=None):
+    """Extract QA items straight from the notes table in chunks, instead of loading each Note."""
+    note_decks = note_decks or {}
+    deck_names = deck_names or {}
+    layouts = {}  # mid -> _field_layout result
     qa = []
-    for nid in notes:
-        n = mw.col.get_note(nid)
-        if n is None:
-            continue
-        if required_model_name and _note_type_name(n) != required_model_name:
-            continue
-        if prompt_field not in n or answer_field not in n:
-            continue
-        front = (n[prompt_field] or "").strip()
-        back = (n[answer_field] or "").strip()
-        if front and back:
-            qa.append({"nid": nid, "prompt": front, "answer": back})
+    for chunk in _chunks(list(notes)):
+        rows = mw.col.db.all(f"select id, mid, flds, tags from notes where id in {_ids_sql(chunk)}")
+        for nid, mid, flds, tags in rows:
+            if mid not in layouts:
+                layouts[mid] = _field_layout(mid, prompt_field, answer_field)
+            layout = layouts[mid]
+            if layout is None:
+                continue
+            mname, prompt_idx, answer_idx = layout
+            if required_model_name and mname != required_model_name:
+                continue
+            fields = flds.split("\x1f")
+            front = (fields[prompt_idx] if prompt_idx < len(fields) else "").strip()
+            back = (fields[answer_idx] if answer_idx < len(fields) else "").strip()
+            if front and back:
+                qa.append({
+                    "nid": nid,
+                    "prompt": front,
+                    "answer": back,
+                    "tags": tags.split(),
+                    "model": mname,
+                    "deck": deck_names.get(note_decks.get(nid), ""),
+                })
     return qa
 
-def _make_quiz_items(qa, num_questions, num_choices, allow_answer_reuse: bool):
+# ---- Compact quiz representation ----
+class AnswerTable:
+    """Interned quiz text: each distinct string is stored once and referred to by an integer id.
+
+    Ids with the same _text_key share a class id, so two options are "the same answer" exactly
+    when their classes compare equal.
+    """
+    __slots__ = ("strings", "ids", "classes", "class_ids")
+
+    def __init__(self, strings=()):
+        self.strings = []
+        self.ids = {}              # text -> id
+        self.classes = array("i")  # id -> equivalence class
+        self.class_ids = {}        # normalized text -> class
+        for text in strings:
+            self.intern(text)
+
+    def intern(self, text: str) -> int:
+        tid = self.ids.get(text)
+        if tid is None:
+            tid = len(self.strings)
+            self.ids[text] = tid
+            self.strings.append(text)
+            self.classes.append(self.class_ids.setdefault(_text_key(text), len(self.class_ids)))
+        return tid
+
+    def __getitem__(self, tid: int) -> str:
+        return self.strings[tid]
+
+    def __len__(self):
+        return len(self.strings)
+
+class NameTable:
+    """Interned deck, model and tag names; unlike AnswerTable there are no answer classes."""
+    __slots__ = ("strings", "ids")
+
+    def __init__(self):
+        self.strings = []
+        self.ids = {}  # name -> id
+
+    def intern(self, name: str) -> int:
+        nid = self.ids.get(name)
+        if nid is None:
+            nid = self.ids[name] = len(self.strings)
+            self.strings.append(name)
+        return nid
+
+    def __getitem__(self, nid: int) -> str:
+        return self.strings[nid]
+
+class QuizItem:
+    """One question: ids into an AnswerTable (prompt, options) and a NameTable (deck, model, tags)."""
+    __slots__ = ("nid", "prompt_id", "option_ids", "correct_idx", "deck_id", "model_id", "tag_ids")
+
+    def __init__(self, nid, prompt_id, option_ids, correct_idx, deck_id, model_id, tag_ids):
+        self.nid = nid
+        self.prompt_id = prompt_id
+        self.option_ids = array("i", option_ids)
+        self.correct_idx = correct_idx
+        self.deck_id = deck_id
+        self.model_id = model_id
+        self.tag_ids = array("i", tag_ids)
+
+    @property
+    def correct_id(self):
+        return self.option_ids[self.correct_idx]
+
+class QuizData:
+    """A quiz as a shared AnswerTable and NameTable and a list of QuizItems.
+
+    accepted maps the nid of an item whose prompt is shared with notes that have other answers to
+    those answers' ids; they grade as correct too.
+    """
+    __slots__ = ("table", "names", "items", "accepted")
+
+    def __init__(self, table: AnswerTable, names: NameTable, items, accepted=None):
+        self.table = table
+        self.names = names
+        self.items = items
+        self.accepted = accepted or {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, i) -> QuizItem:
+        return self.items[i]
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def text(self, tid: int) -> str:
+        return self.table[tid]
+
+    def deck(self, item: QuizItem) -> str:
+        return self.names[item.deck_id]
+
+    def model(self, item: QuizItem) -> str:
+        return self.names[item.model_id]
+
+    def tags(self, item: QuizItem):
+        return [self.names[t] for t in item.tag_ids]
+
+    def accepted_ids(self, item: QuizItem):
+        """The correct answer id followed by any alternates accepted for the item's prompt."""
+        return [item.correct_id] + [a for a in self.accepted.get(item.nid, ()) if a != item.correct_id]
+
+    def is_correct(self, item: QuizItem, option_idx: int) -> bool:
+        classes = self.table.classes
+        chosen = classes[item.option_ids[option_idx]]
+        return any(chosen == classes[aid] for aid in self.accepted_ids(item))
+
+def _prompt_conflicts(prompt_groups, classes):
+    """Find notes sharing a normalized prompt.
+
+    Returns (accepted, conflicts): accepted maps each nid in a group with differing answers to one
+    answer id per answer class in the group; conflicts lists every group of two or more notes.
+    """
+    accepted = {}
+    conflicts = []
+    for members in prompt_groups.values():
+        if len(members) < 2:
+            continue
+        by_class = {}
+        for _nid, aid, _prompt in members:
+            by_class.setdefault(classes[aid], aid)
+        conflicts.append({"members": members, "conflicting": len(by_class) > 1})
+        if len(by_class) > 1:
+            alternates = list(by_class.values())
+            for nid, _aid, _prompt in members:
+                accepted[nid] = alternates
+    return accepted, conflicts
+
+def _build_answer_index(qa):
+    """Intern the extracted items once; re-quizzes reuse this without touching the collection.
+
+    pools: source deck name id (None for all decks) -> one answer id per answer class.
+    The same single pass groups notes by normalized prompt (see _prompt_conflicts).
+    """
+    table = AnswerTable()
+    names = NameTable()
+    pools = {None: {}}
+    answer_nids = {}  # answer id -> first note with that answer, for distractor pair stats
+    nid_answers = {}
+    prompt_groups = {}  # normalized prompt -> [(nid, answer id, raw prompt)]
+    for x in qa:
+        aid = table.intern(x["answer"])
+        cls = table.classes[aid]
+        pools[None].setdefault(cls, aid)
+        if x.get("deck"):
+            pools.setdefault(names.intern(x["deck"]), {}).setdefault(cls, aid)
+        answer_nids.setdefault(aid, x["nid"])
+        nid_answers[x["nid"]] = aid
+        prompt_groups.setdefault(_text_key(x["prompt"]), []).append((x["nid"], aid, x["prompt"]))
+    accepted, conflicts = _prompt_conflicts(prompt_groups, table.classes)
+    return {
+        "table": table,
+        "names": names,
+        "pools": {deck: list(p.values()) for deck, p in pools.items()},
+        "deck_classes": {deck: set(p) for deck, p in pools.items()},
+        "answer_nids": answer_nids,
+        "nid_answers": nid_answers,
+        "accepted": accepted,
+        "conflicts": conflicts,
+    }
+
+def _sample_distractors(pool, exclude_classes, k, classes):
+    """Up to k answer ids from pool whose class is not in exclude_classes."""
+    picked = random.sample(pool, min(len(pool), k + len(exclude_classes)))
+    return [aid for aid in picked if classes[aid] not in exclude_classes][:k]
+
+def _confusers(answer_index, distractor_stats, qnid):
+    """Split a question's recorded distractors into favoured {answer id: pick probability} and retired answer ids.
+
+    A distractor that was chosen is favoured in proportion to its smoothed pick rate; one shown
+    DISTRACTOR_RETIRE_AFTER times without ever being chosen is retired.
+    """
+    favoured, retired = {}, []
+    if distractor_stats is None:
+        return favoured, retired
+    nid_answers = answer_index["nid_answers"]
+    for dnid, (shown, chosen, _last_used) in distractor_stats.confusers(qnid).items():
+        aid = nid_answers.get(dnid)
+        if aid is None:
+            continue  # note not in this quiz's selection
+        if chosen:
+            favoured[aid] = min(0.9, 2.0 * (chosen + 1) / (shown + 2))
+        elif shown >= DISTRACTOR_RETIRE_AFTER:
+            retired.append(aid)
+    return favoured, retired
+
+def _pick_options(answer_index, correct_id, deck_id, num_choices, allow_answer_reuse: bool, cross_deck: bool, confusers=None,
+                  accepted_ids=()):
+    """Return (option ids, index of correct_id) for one question.
+
+    confusers (from _confusers) fill up to half the distractor slots with answers that fooled the
+    user before and keep retired ones out unless nothing else is left. accepted_ids (alternate
+    answers for the same prompt) are never offered as distractors.
+    """
+    classes = answer_index["table"].classes
+    pools = answer_index["pools"]
+    need = max(0, num_choices - 1)
+    used = {classes[correct_id]} | {classes[aid] for aid in accepted_ids}
+    favoured, retired = confusers or ({}, [])
+
+    answer_pool = pools[None] if cross_deck else pools.get(deck_id, pools[None])
+    if not cross_deck and deck_id in answer_index["deck_classes"]:
+        allowed = answer_index["deck_classes"][deck_id]
+        favoured = {aid: p for aid, p in favoured.items() if classes[aid] in allowed}
+    others = []
+    for aid in favoured:
+        if len(others) >= (need + 1) // 2:
+            break
+        if classes[aid] not in used and random.random() < favoured[aid]:
+            others.append(aid)
+            used.add(classes[aid])
+
+    skip = used | {classes[aid] for aid in retired}
+    # source deck first, then the other selected decks, then retired distractors as a last resort
+    for pool, exclude in ((answer_pool, skip), (pools[None], skip), (pools[None], used)):
+        if len(others) >= need:
+            break
+        exclude = exclude | {classes[o] for o in others}
+        others += _sample_distractors(pool, exclude, need - len(others), classes)
+    options = [correct_id] + others
+
+    if allow_answer_reuse and others:
+        # repeat a distractor rather than add a second correct option; with no distractor at all
+        # every remaining answer is the correct one or an accepted alternate, so leave fewer options
+        while len(options) < num_choices:
+            options.append(random.choice(others))
+
+    options = options[:num_choices]
+    random.shuffle(options)
+    return options, options.index(correct_id)
+
+def _make_quiz_items(qa, num_questions, num_choices, allow_answer_reuse: bool, cross_deck: bool = True, answer_index=None,
+                     distractor_stats=None) -> QuizData:
     if len(qa) == 0:
         raise ValueError("No notes found to generate questions.")
     pool = qa[:]
     random.shuffle(pool)
     selected = pool[:min(num_questions, len(pool))]
-    all_answers = [x["answer"] for x in qa]
-
-    quiz = []
-    for item in selected:
-        correct = item["answer"]
-        options = [correct]
-
-        if allow_answer_reuse:
-            unique_others = [a for a in set(all_answers) if _normalize_html(a) != _normalize_html(correct)]
-            random.shuffle(unique_others)
-            options += unique_others[:max(0, num_choices - 1)]
-            while len(options) < num_choices:
-                options.append(random.choice(all_answers))
-        else:
-            candidates = [a for a in set(all_answers) if _normalize_html(a) != _normalize_html(correct)]
-            random.shuffle(candidates)
-            options += candidates[:max(0, num_choices - 1)]
-
-        options = options[:num_choices]
-        random.shuffle(options)
-
-        quiz.append({
-            "nid": item["nid"],
-            "prompt": item["prompt"],     # raw HTML allowed
-            "correct": correct,           # raw HTML allowed
-            "options": options,           # list of raw HTML strings
-        })
-    return quiz
+    if answer_index is None:
+        answer_index = _build_answer_index(qa)
+    table = answer_index["table"]
+    names = answer_index["names"]
+    accepted = {}
+
+    items = []
+    for x in selected:
+        deck_id = names.intern(x.get("deck", ""))
+        alternates = answer_index["accepted"].get(x["nid"], ())
+        if alternates:
+            accepted[x["nid"]] = alternates
+        options, correct_idx = _pick_options(answer_index, table.intern(x["answer"]), deck_id,
+                                             num_choices, allow_answer_reuse, cross_deck,
+                                             _confusers(answer_index, distractor_stats, x["nid"]), alternates)
+        items.append(QuizItem(x["nid"], table.intern(x["prompt"]), options, correct_idx, deck_id,
+                              names.intern(x.get("model", "")), [names.intern(t) for t in x.get("tags", [])]))
+    return QuizData(table, names, items, accepted)
+
+def _requiz_items(items, num_choices, allow_answer_reuse: bool, cross_deck: bool, answer_index,
+                  distractor_stats=None) -> QuizData:
+    """Same questions with freshly sampled options, sharing the answer index's table."""
+    new_items = []
+    accepted = {}
+    for item in items:
+        alternates = answer_index["accepted"].get(item.nid, ())
+        if alternates:
+            accepted[item.nid] = alternates
+        options, correct_idx = _pick_options(answer_index, item.correct_id, item.deck_id,
+                                             num_choices, allow_answer_reuse, cross_deck,
+                                             _confusers(answer_index, distractor_stats, item.nid), alternates)
+        new_items.append(QuizItem(item.nid, item.prompt_id, options, correct_idx,
+                                  item.deck_id, item.model_id, item.tag_ids))
+    return QuizData(answer_index["table"], answer_index["names"], new_items, accepted)
+
+# ---- Tag index ----
+class TagIndex:
+    """Prefix trie over the collection's tags, with the note ids carrying each tag.
+
+    Tags are matched case-insensitively like Anki's tag: search. Built with one scan of the notes
+    table, then refreshed from notes modified since the last refresh; deleted notes are reported
+    through forget(). Undo and sync can leave a changed note with an older mod, so they
+    invalidate() the index for a full rebuild instead.
+    """
+    END = ""  # trie key marking a complete tag (never a single character)
+
+    def __init__(self):
+        self._clear()
+        self.stale = True
+
+    def invalidate(self):
+        self.refreshed_at = 0
+        self.stale = True
+
+    def _clear(self):
+        self.root = {}
+        self.notes = {}      # lowercased tag -> set of nids
+        self.display = {}    # lowercased tag -> tag as first seen
+        self.note_tags = {}  # nid -> lowercased tags, so changed notes can be re-indexed
+        self.deleted = set() # nids removed since the last refresh
+        self.refreshed_at = 0
+
+    def _add(self, nid, tag):
+        key = tag.lower()
+        if key not in self.notes:
+            node = self.root
+            for ch in key:
+                node = node.setdefault(ch, {})
+            node[self.END] = key
+            self.notes[key] = set()
+            self.display[key] = tag
+        self.notes[key].add(nid)
+
+    def _remove(self, nid, key):
+        nids = self.notes.get(key)
+        if nids is not None:
+            nids.discard(nid)
+
+    def set_note(self, nid, tags: str):
+        for key in self.note_tags.pop(nid, ()):
+            self._remove(nid, key)
+        keys = []
+        for tag in tags.split():
+            self._add(nid, tag)
+            keys.append(tag.lower())
+        if keys:
+            self.note_tags[nid] = keys
+
+    def forget(self, nids):
+        self.deleted.update(nids)
+        self.stale = True
+
+    def refresh(self):
+        """Re-index notes changed since the last refresh and drop notes that were deleted."""
+        started = int(time.time())
+        if self.refreshed_at == 0:
+            self._clear()
+        for nid in self.deleted:
+            self.set_note(nid, "")
+        self.deleted.clear()
+        rows = mw.col.db.all("select id, tags from notes where mod >= ?", self.refreshed_at)
+        for nid, tags in rows:
+            self.set_note(nid, tags)
+        self.refreshed_at = started
+        self.stale = False
+
+    def count(self, tag):
+        return len(self.notes.get(tag.lower(), ()))
+
+    def _node(self, prefix):
+        node = self.root
+        for ch in prefix.lower():
+            node = node.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def _keys_under(self, node):
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            for ch, child in n.items():
+                if ch == self.END:
+                    if self.notes.get(child):
+                        yield child
+                else:
+                    stack.append(child)
+
+    def complete(self, prefix, limit=MAX_TAG_COMPLETIONS):
+        """Tags starting with prefix, most used first, as (tag, note count)."""
+        node = self._node(prefix)
+        if node is None:
+            return []
+        keys = heapq.nsmallest(limit, self._keys_under(node), key=lambda k: (-len(self.notes[k]), k))
+        return [(self.display[k], len(self.notes[k])) for k in keys]
+
+    def _matching_keys(self, tag):
+        # same semantics as tag:foo -> foo and foo::*, with * matching any run of characters
+        tag = tag.strip().lower()
+        if "*" in tag:
+            node = self._node(tag.split("*", 1)[0])
+            if node is None:
+                return []
+            pattern = re.compile(".*".join(map(re.escape, tag.split("*"))) + "(?:::.*)?", re.S)
+            return [k for k in self._keys_under(node) if pattern.fullmatch(k)]
+        keys = [tag] if self.notes.get(tag) else []
+        node = self._node(tag + "::")
+        if node is not None:
+            keys.extend(self._keys_under(node))
+        return keys
+
+    def note_ids(self, tags):
+        """Union of the note ids carrying any of tags (or their child tags)."""
+        res = set()
+        for tag in tags:
+            for key in self._matching_keys(tag):
+                res |= self.notes[key]
+        return res
+
+    def unknown(self, tags):
+        return [t for t in tags if t.strip() and not self._matching_keys(t)]
+
+_tag_index = None
+
+def _get_tag_index():
+    global _tag_index
+    if _tag_index is None:
+        _tag_index = TagIndex()
+    if _tag_index.stale:
+        _tag_index.refresh()
+    return _tag_index
+
+def _on_operation_did_execute(changes, _handler):
+    if _tag_index is not None and (getattr(changes, "tag", False) or getattr(changes, "note_text", False)):
+        _tag_index.stale = True
+
+def _on_notes_will_be_deleted(_col, nids):
+    if _tag_index is not None:
+        _tag_index.forget(nids)
+
+def _on_tag_index_invalidated(*_args):
+    if _tag_index is not None:
+        _tag_index.invalidate()
+
+def _on_profile_will_close():
+    global _tag_index
+    _tag_index = None
 
 # Quiz history helpers
 def _history_path():
@@ -195,6 +777,256 @@ def _save_history(nid_list):
     with open(_history_path(), "w", encoding="utf-8") as f:
         json.dump(list(history), f)
 
+# Distractor effectiveness
+def _distractor_stats_path():
+    addon_folder = os.path.dirname(__file__)
+    return os.path.join(addon_folder, "distractor_stats.json")
+
+class DistractorStats:
+    """How often each (question note, distractor note) pair was shown and chosen.
+
+    Saved as {"clock": n, "pairs": {"qnid:dnid": [shown, chosen, last_used]}}. last_used is a
+    logical clock bumped once per recorded quiz; beyond MAX_DISTRACTOR_PAIRS pairs the least
+    recently used ones are evicted.
+    """
+
+    def __init__(self, clock=0):
+        self.clock = clock
+        self.by_question = {}  # qnid -> {dnid: [shown, chosen, last_used]}
+        self.size = 0
+
+    @classmethod
+    def load(cls):
+        try:
+            with open(_distractor_stats_path(), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            stats = cls(int(data.get("clock", 0)))
+            for key, entry in data.get("pairs", {}).items():
+                qnid, dnid = key.split(":")
+                shown, chosen, last_used = entry
+                stats._entry(int(qnid), int(dnid))[:] = [int(shown), int(chosen), int(last_used)]
+            return stats
+        except Exception:
+            # a corrupt file must not stop quizzes from starting; learning restarts from scratch
+            return cls()
+
+    def _entry(self, qnid, dnid):
+        row = self.by_question.setdefault(qnid, {})
+        entry = row.get(dnid)
+        if entry is None:
+            entry = row[dnid] = [0, 0, self.clock]
+            self.size += 1
+        return entry
+
+    def confusers(self, qnid):
+        return self.by_question.get(qnid, {})
+
+    def record(self, qnid, shown_dnids, chosen_dnid=None):
+        """Count one showing of each distractor for qnid, and the pick if a distractor was chosen."""
+        for dnid in shown_dnids:
+            entry = self._entry(qnid, dnid)
+            entry[0] += 1
+            entry[1] += int(dnid == chosen_dnid)
+            entry[2] = self.clock
+
+    def tick(self):
+        self.clock += 1
+
+    def _evict(self):
+        if self.size <= MAX_DISTRACTOR_PAIRS:
+            return
+        # oldest first; among equally old pairs, drop ones that never fooled the user first
+        pairs = ((entry[2], entry[1], qnid, dnid) for qnid, row in self.by_question.items() for dnid, entry in row.items())
+        for _last_used, _chosen, qnid, dnid in heapq.nsmallest(self.size - MAX_DISTRACTOR_PAIRS, pairs):
+            row = self.by_question[qnid]
+            del row[dnid]
+            if not row:
+                del self.by_question[qnid]
+            self.size -= 1
+
+    def save(self):
+        self._evict()
+        pairs = {f"{qnid}:{dnid}": entry for qnid, row in self.by_question.items() for dnid, entry in row.items()}
+        with open(_distractor_stats_path(), "w", encoding="utf-8") as f:
+            json.dump({"clock": self.clock, "pairs": pairs}, f, separators=(",", ":"))
+
+# Quiz statistics helpers
+#   quiz_stats.json:      {notes_quizzed, aggregates: deck/tag/model -> name -> {asked, correct,
+#                          days: {YYYY-MM-DD -> [asked, correct]}}, plus "all" -> "" -> overall totals}
+#   quiz_note_stats.json: nid -> {asked, correct, last_seen, avg_ms, timed, wrong: {answer text -> count}}
+# Aggregates are updated together with the note stats but stored apart, so the analytics view
+# reads only the small aggregate file and never the per-note records.
+def _stats_path():
+    addon_folder = os.path.dirname(__file__)
+    return os.path.join(addon_folder, "quiz_stats.json")
+
+def _note_stats_path():
+    addon_folder = os.path.dirname(__file__)
+    return os.path.join(addon_folder, "quiz_note_stats.json")
+
+def _empty_stats():
+    return {"notes_quizzed": 0, "aggregates": {"all": {}, "deck": {}, "tag": {}, "model": {}}}
+
+def _load_stats():
+    """The aggregate stats only."""
+    stats = _empty_stats()
+    try:
+        with open(_stats_path(), "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except Exception:
+        return stats
+    for dim, buckets in saved.get("aggregates", {}).items():
+        stats["aggregates"].setdefault(dim, {}).update(buckets)
+    stats["notes_quizzed"] = int(saved.get("notes_quizzed", 0))
+    old_notes = saved.get("notes")
+    if old_notes:
+        # file from before note stats had their own file: derive the counters once
+        stats["notes_quizzed"] = len(old_notes)
+        if not stats["aggregates"]["all"]:
+            stats["aggregates"]["all"][""] = {
+                "asked": sum(ns.get("asked", 0) for ns in old_notes.values()),
+                "correct": sum(ns.get("correct", 0) for ns in old_notes.values()),
+                "days": {},
+            }
+    return stats
+
+def _load_note_stats():
+    try:
+        with open(_note_stats_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception:
+        return {}
+    # not written yet: pick up note stats saved inside quiz_stats.json by older versions
+    try:
+        with open(_stats_path(), "r", encoding="utf-8") as f:
+            return json.load(f).get("notes", {})
+    except Exception:
+        return {}
+
+def _save_stats(stats, notes):
+    with open(_note_stats_path(), "w", encoding="utf-8") as f:
+        json.dump(notes, f)
+    with open(_stats_path(), "w", encoding="utf-8") as f:
+        json.dump(stats, f)
+
+def _bump_aggregate(buckets, key, day, correct: bool):
+    entry = buckets.setdefault(key, {"asked": 0, "correct": 0, "days": {}})
+    entry["asked"] += 1
+    entry["correct"] += int(correct)
+    daily = entry["days"].setdefault(day, [0, 0])
+    daily[0] += 1
+    daily[1] += int(correct)
+
+def _update_stats(stats, notes, results, now=None):
+    """Fold one finished quiz into the note stats and aggregates.
+
+    results: list of dicts with nid, correct, chosen, ms, deck, tags, model.
+    """
+    now = int(time.time() if now is None else now)
+    day = time.strftime("%Y-%m-%d", time.localtime(now))
+    aggregates = stats["aggregates"]
+    for r in results:
+        key = str(r["nid"])
+        if key not in notes:
+            stats["notes_quizzed"] += 1
+        ns = notes.setdefault(key, {"asked": 0, "correct": 0, "last_seen": 0, "avg_ms": 0.0, "timed": 0, "wrong": {}})
+        ns["asked"] += 1
+        ns["last_seen"] = now
+        if r["correct"]:
+            ns["correct"] += 1
+        elif r.get("chosen"):
+            wrong = ns["wrong"]
+            text = _strip_html(r["chosen"])
+            wrong[text] = wrong.get(text, 0) + 1
+            if len(wrong) > MAX_WRONG_OPTIONS_TRACKED:
+                del wrong[min(wrong, key=wrong.get)]
+        if r.get("ms") is not None:
+            # running mean, so no per-answer history is kept
+            ns["timed"] += 1
+            ns["avg_ms"] += (r["ms"] - ns["avg_ms"]) / ns["timed"]
+
+        _bump_aggregate(aggregates["all"], "", day, r["correct"])
+        _bump_aggregate(aggregates["deck"], r.get("deck") or "", day, r["correct"])
+        for tag in r.get("tags") or []:
+            _bump_aggregate(aggregates["tag"], tag, day, r["correct"])
+        _bump_aggregate(aggregates["model"], r.get("model") or "", day, r["correct"])
+    return stats
+
+def _most_chosen_wrong(note_stats):
+    wrong = note_stats.get("wrong") or {}
+    if not wrong:
+        return None
+    return max(wrong, key=wrong.get)
+
+def _record_quiz_stats(results):
+    stats = _load_stats()
+    notes = _load_note_stats()
+    _update_stats(stats, notes, results)
+    _save_stats(stats, notes)
+
+def _pct(correct, asked):
+    return f"{round(100 * correct / max(1, asked))}%"
+
+# ---- Settings store ----
+class SettingsStore:
+    """The add-on config kept in memory; changes are written once the user has been idle for
+    SETTINGS_WRITE_DELAY_MS, or on flush() when the dialog closes."""
+
+    def __init__(self, parent=None):
+        self.data = mw.addonManager.getConfig(__name__) or {}
+        self.dirty = False
+        self.timer = QTimer(parent)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(SETTINGS_WRITE_DELAY_MS)
+        self.timer.timeout.connect(self.flush)
+
+    def set(self, key, value):
+        if self.data.get(key) == value:
+            return
+        self.data[key] = value
+        self.dirty = True
+        self.timer.start()  # restarting the timer pushes the write back while changes keep coming
+
+    def update(self, values):
+        for key, value in values.items():
+            self.set(key, value)
+
+    def flush(self):
+        self.timer.stop()
+        if not self.dirty:
+            return
+        try:
+            mw.addonManager.writeConfig(__name__, self.data)
+        except Exception:
+            pass
+        self.dirty = False
+
+# ---- Quiz stylesheet ----
+def _quiz_stylesheet(q_font_size: int, a_font_size: int) -> str:
+    """One stylesheet for the whole quiz page, applied to quiz_widget.
+
+    Widgets opt in with the quizRole / quizResult / quizMark dynamic properties, so a font change
+    is a single setStyleSheet call however many questions are on the page.
+    """
+    answer = '*[quizRole="answer"]'
+    return f"""
+        QLabel[quizRole="prompt"] {{ font-size: {int(q_font_size)}px; }}
+        {answer} QLabel, {answer} QRadioButton, {answer} QLineEdit, {answer} QPushButton {{ font-size: {int(a_font_size)}px; }}
+        QGroupBox[quizResult="pending"] {{ {GROUP_BOX_STYLE.format(color="#afafaf")} }}
+        QGroupBox[quizResult="correct"] {{ {GROUP_BOX_STYLE.format(color="green")} }}
+        QGroupBox[quizResult="wrong"] {{ {GROUP_BOX_STYLE.format(color="red")} }}
+        QRadioButton[quizMark="correct"] {{ color: green; }}
+        QRadioButton[quizMark="wrong"] {{ color: red; }}
+    """
+
+def _set_style_state(widget, name: str, value: str):
+    """Change a dynamic property the stylesheet selects on and re-polish just that widget."""
+    widget.setProperty(name, value)
+    widget.style().unpolish(widget)
+    widget.style().polish(widget)
+
 # ---- Option row widget (Radio + HTML label) ----
 class OptionRow(QWidget):
     def __init__(self, html_text: str, parent=None):
@@ -230,14 +1062,150 @@ class OptionRow(QWidget):
     def set_background(self, color_css: str):
         self.setStyleSheet(f"QWidget {{ background: {color_css}; border-radius: 6px; }}")
 
+# ---- Typed answer row (line edit + feedback label) ----
+class TypedAnswerRow(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        col = QVBoxLayout(self)
+        col.setContentsMargins(0, 4, 0, 4)
+        row = QHBoxLayout()
+        self.edit = QLineEdit(self)
+        self.edit.setPlaceholderText("Type your answer and press Enter")
+        self.edit.setMaximumWidth(700)
+        row.addWidget(self.edit, 1)
+        self.check_btn = QPushButton("Check", self)
+        row.addWidget(self.check_btn, 0)
+        col.addLayout(row)
+        self.feedback = QLabel(self)
+        self.feedback.setTextFormat(Qt.TextFormat.RichText)
+        self.feedback.setWordWrap(True)
+        self.feedback.hide()
+        col.addWidget(self.feedback)
+
+    def lock(self):
+        self.edit.setReadOnly(True)
+        self.check_btn.setEnabled(False)
+
+    def show_feedback(self, html_text: str):
+        self.feedback.setText(html_text)
+        self.feedback.show()
+
+# ---- Analytics view (reads precomputed aggregates only) ----
+class AnalyticsDialog(QDialog):
+    SECTIONS = (("deck", "Decks"), ("tag", "Tags"), ("model", "Note types"))
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Quiz Analytics")
+        self.resize(ANALYTICS_WIDTH, ANALYTICS_HEIGHT)
+        layout = QVBoxLayout(self)
+
+        stats = _load_stats()
+        overall = stats["aggregates"]["all"].get("", {"asked": 0, "correct": 0})
+        asked, correct = overall["asked"], overall["correct"]
+        layout.addWidget(QLabel(f"Notes quizzed: {stats['notes_quizzed']}    Answers: {asked}    Accuracy: {_pct(correct, asked)}"))
+
+        self.tree = QTreeWidget(self)
+        self.tree.setColumnCount(5)
+        self.tree.setHeaderLabels(["Name", "Asked", "Correct", "Accuracy", "Details"])
+        self.tree.setColumnWidth(0, 300)
+        layout.addWidget(self.tree)
+
+        for dim, title in self.SECTIONS:
+            section = QTreeWidgetItem(self.tree, [title])
+            buckets = stats["aggregates"].get(dim, {})
+            for name in sorted(buckets):
+                entry = buckets[name]
+                row = QTreeWidgetItem(section, [name or "(none)", str(entry["asked"]), str(entry["correct"]), _pct(entry["correct"], entry["asked"])])
+                # one child per day, newest first, to show accuracy over time
+                for day in sorted(entry.get("days", {}), reverse=True):
+                    d_asked, d_correct = entry["days"][day]
+                    QTreeWidgetItem(row, [day, str(d_asked), str(d_correct), _pct(d_correct, d_asked)])
+            section.setExpanded(dim == "deck")
+
+        # per-note stats are only loaded when this section is first expanded
+        self.notes_section = QTreeWidgetItem(self.tree, ["Notes (hardest first)"])
+        self.notes_section.setChildIndicatorPolicy(QTreeWidgetItem.ChildIndicatorPolicy.ShowIndicator)
+        self.tree.itemExpanded.connect(self._on_item_expanded)
+
+        close_btn = QPushButton("Close", self)
+        close_btn.clicked.connect(self.accept)
+        layout.addWidget(close_btn)
+
+    def _on_item_expanded(self, item):
+        if item is not self.notes_section or item.childCount():
+            return
+        ranked = sorted(_load_note_stats().items(), key=lambda kv: (kv[1]["correct"] / max(1, kv[1]["asked"]), -kv[1]["asked"]))
+        for nid, ns in ranked:
+            details = f"avg {ns.get('avg_ms', 0) / 1000:.1f} s"
+            wrong = _most_chosen_wrong(ns)
+            if wrong:
+                details += f"; most chosen wrong: {wrong}"
+            QTreeWidgetItem(item, [nid, str(ns["asked"]), str(ns["correct"]), _pct(ns["correct"], ns["asked"]), details])
+
+# ---- Ambiguous prompts (notes sharing a prompt) ----
+class AmbiguityDialog(QDialog):
+    def __init__(self, conflicts, table: AnswerTable, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Ambiguous Notes")
+        self.resize(ANALYTICS_WIDTH, ANALYTICS_HEIGHT)
+        layout = QVBoxLayout(self)
+        n_conflicting = sum(1 for c in conflicts if c["conflicting"])
+        layout.addWidget(QLabel(f"Prompts with different answers: {n_conflicting}    "
+                                f"Duplicate notes: {len(conflicts) - n_conflicting}"))
+
+        self.tree = QTreeWidget(self)
+        self.tree.setColumnCount(2)
+        self.tree.setHeaderLabels(["Prompt / Note id", "Answer"])
+        self.tree.setColumnWidth(0, 300)
+        layout.addWidget(self.tree)
+
+        self.nids = []
+        # conflicting answers first, they are the ones that affect grading
+        for conflict in sorted(conflicts, key=lambda c: not c["conflicting"]):
+            members = conflict["members"]
+            kind = "different answers" if conflict["conflicting"] else "duplicates"
+            group = QTreeWidgetItem(self.tree, [_strip_html(members[0][2]), f"{len(members)} notes, {kind}"])
+            group.setData(0, Qt.ItemDataRole.UserRole, [nid for nid, _aid, _prompt in members])
+            for nid, aid, _prompt in members:
+                QTreeWidgetItem(group, [str(nid), _strip_html(table[aid])])
+                self.nids.append(nid)
+
+        browse_btn = QPushButton("Browse Selected (or All)", self)
+        browse_btn.clicked.connect(self._on_browse)
+        layout.addWidget(browse_btn)
+        close_btn = QPushButton("Close", self)
+        close_btn.clicked.connect(self.accept)
+        layout.addWidget(close_btn)
+
+    def _on_browse(self):
+        nids = []
+        for item in self.tree.selectedItems():
+            group = item if item.parent() is None else item.parent()
+            nids.extend(group.data(0, Qt.ItemDataRole.UserRole))
+        query = "nid:" + ",".join(str(nid) for nid in (nids or self.nids))
+        # this dialog and the quiz window are both modal and would block the Browser, so close them
+        self.accept()
+        if isinstance(self.parent(), QDialog):
+            self.parent().close()
+        browser = dialogs.open("Browser", mw)
+        try:
+            browser.search_for(query)
+        except Exception:
+            browser.form.searchEdit.lineEdit().setText(query)
+            browser.onSearchActivated()
+
 class MCQuizDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Automated Quiz")
         self.resize(MENU_WIDTH, MENU_HEIGHT)
         # item_list = [listWidget.item(i).text() for i in range(listWidget.count())]
-        self.cfg = mw.addonManager.getConfig(__name__) or {}
-        self.cfg.setdefault("default_deck", "")
+        self.settings = SettingsStore(self)
+        self.cfg = self.settings.data
+        old_deck = self.cfg.pop("default_deck", "")  # single-deck setting from older versions
+        self.cfg.setdefault("default_decks", [old_deck] if old_deck else [])
+        self.cfg.setdefault("cross_deck_distractors", False)
         self.cfg.setdefault("num_choices", 4)
         self.cfg.setdefault("num_questions", 25)
         self.cfg.setdefault("exclude_tags", [])
@@ -249,6 +1217,10 @@ class MCQuizDialog(QDialog):
         self.cfg.setdefault("card_states", ["learn, due"])
         self.cfg.setdefault("font_size_q", 22)
         self.cfg.setdefault("font_size_a", 14)
+        self.cfg.setdefault("typed_answers", False)
+        self.cfg.setdefault("typed_max_distance", 2)
+        self.cfg.setdefault("typed_max_ratio", 0.2)
+        self.cfg.setdefault("distractor_learning", True)
 
         layout = QVBoxLayout(self)
 
@@ -256,16 +1228,16 @@ class MCQuizDialog(QDialog):
         self.config_widget = QWidget(self)
         config_layout = QVBoxLayout(self.config_widget)
 
-        decks = _get_all_decks()
-        self.deck_cb = QComboBox(self.config_widget)
-        names = [name for (_id, name) in decks]
-        self.deck_cb.addItems(names)
-        if self.cfg["default_deck"] and self.cfg["default_deck"] in names:
-            self.deck_cb.setCurrentText(self.cfg["default_deck"])
-
-        # Deck
-        config_layout.addWidget(QLabel("Deck:"))
-        config_layout.addWidget(self.deck_cb)
+        # Decks (checking a parent selects its whole subtree)
+        config_layout.addWidget(QLabel("Decks:"))
+        self.deck_tree = QTreeWidget(self.config_widget)
+        self.deck_tree.setHeaderHidden(True)
+        self.deck_tree.setFixedHeight(DECK_TREE_HEIGHT)
+        self.deck_items = {}  # full deck name -> QTreeWidgetItem
+        self._build_deck_tree(_get_all_decks(), self.cfg["default_decks"])
+        config_layout.addWidget(self.deck_tree)
+        self.deck_models = {}
+        self._deck_refresh_pending = False
 
         # Note type
         config_layout.addWidget(QLabel("Note type:"))
@@ -395,8 +1367,35 @@ class MCQuizDialog(QDialog):
         self.dup_cb.setChecked(bool(self.cfg["allow_answer_reuse"]))
         config_layout.addWidget(self.dup_cb)
 
+        # Typed answers
+        self.typed_cb = QCheckBox("Typed answers instead of multiple choice", self.config_widget)
+        self.typed_cb.setChecked(bool(self.cfg["typed_answers"]))
+        config_layout.addWidget(self.typed_cb)
+
+        # Distractors across decks
+        self.cross_deck_cb = QCheckBox("Draw distractors from all selected decks", self.config_widget)
+        self.cross_deck_cb.setChecked(bool(self.cfg["cross_deck_distractors"]))
+        config_layout.addWidget(self.cross_deck_cb)
+
         # Exclude tags
         config_layout.addWidget(QLabel("Exclude tags (optional):"))
+        tagEntryRow = QHBoxLayout()
+        self.tag_edit = QLineEdit(self.config_widget)
+        self.tag_edit.setPlaceholderText("Start typing a tag...")
+        self.tag_model = QStringListModel(self.config_widget)
+        self.tag_completer = QCompleter(self.tag_model, self.config_widget)
+        self.tag_completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.tag_edit.setCompleter(self.tag_completer)
+        self.tag_edit.textEdited.connect(self._on_tag_text_edited)
+        self.tag_edit.returnPressed.connect(self._on_add_tag)
+        tagEntryRow.addWidget(self.tag_edit, 1)
+        self.add_tag_btn = QPushButton("Add", self.config_widget)
+        self.add_tag_btn.clicked.connect(self._on_add_tag)
+        tagEntryRow.addWidget(self.add_tag_btn, 0)
+        self.remove_tag_btn = QPushButton("Remove", self.config_widget)
+        self.remove_tag_btn.clicked.connect(self._on_remove_tag)
+        tagEntryRow.addWidget(self.remove_tag_btn, 0)
+        config_layout.addLayout(tagEntryRow)
         self.tags_list = QListWidget(self.config_widget)
         self.tags_list.setFixedHeight(100)
         self.tags_list.setEditTriggers(QAbstractItemView.EditTrigger.AllEditTriggers)
@@ -414,6 +1413,16 @@ class MCQuizDialog(QDialog):
         self.clear_history_btn.clicked.connect(self._on_clear_history)
         config_layout.addWidget(self.clear_history_btn)
 
+        # Ambiguous prompts
+        self.ambiguous_btn = QPushButton("Find Ambiguous Notes", self.config_widget)
+        self.ambiguous_btn.clicked.connect(self._on_find_ambiguous)
+        config_layout.addWidget(self.ambiguous_btn)
+
+        # Analytics
+        self.analytics_btn = QPushButton("Quiz Analytics", self.config_widget)
+        self.analytics_btn.clicked.connect(self._on_show_analytics)
+        config_layout.addWidget(self.analytics_btn)
+
         # Start quiz
         self.start_btn = QPushButton("Start Quiz", self.config_widget)
         self.start_btn.clicked.connect(self.start_quiz)
@@ -423,6 +1432,7 @@ class MCQuizDialog(QDialog):
 
         # --- Quiz container inside a scroll area ---
         self.quiz_widget = QWidget()
+        self.quiz_widget.setStyleSheet(_quiz_stylesheet(self.cfg["font_size_q"], self.cfg["font_size_a"]))
         self.quiz_container = QVBoxLayout(self.quiz_widget)
         self.quiz_widget.setLayout(self.quiz_container)
 
@@ -481,15 +1491,20 @@ class MCQuizDialog(QDialog):
         self.afontsize.hide()
 
         # Signals
-        self.deck_cb.currentTextChanged.connect(self._on_deck_changed)
+        self.deck_tree.itemChanged.connect(self._on_deck_item_changed)
         self.model_cb.currentTextChanged.connect(self._on_model_changed)
 
         # Init
-        self._on_deck_changed(self.deck_cb.currentText())
+        self._on_decks_changed()
 
         self.state = {"quiz": [], "idx": 0, "correct": 0, "total": 0, "page": 0, "per_page": 1}
         self.current_question_widgets = []
-        self.user_answers = {}  # quiz index -> chosen raw html
+        self.user_answers = {}  # quiz index -> chosen raw html (or typed text)
+        self.user_choices = {}  # quiz index -> chosen option index (multiple choice only)
+        self.user_correct = {}  # quiz index -> bool
+        self.shown_at = {}  # quiz index -> monotonic time the question was first shown
+        self.response_ms = {}  # quiz index -> ms taken to answer
+        self.last_answer_at = 0.0
 
     def _on_font_button(self):
         val = self.font_btn.text()
@@ -507,20 +1522,15 @@ class MCQuizDialog(QDialog):
             self.afontsize.show()
 
     def _on_font_changed(self):
-        
-        for qlabel in self.qlabels:
-            qlabel.setStyleSheet("font-size: " + str(self.qfontsize.value()) + "px;")
-            
-        for alabel in self.alabels:
-            alabel.setStyleSheet("font-size: " + str(self.afontsize.value()) + "px;")
-        
-        self.cfg["font_size_q"] = int(self.qfontsize.value())
-        self.cfg["font_size_a"] = int(self.afontsize.value())
-        
-        try:
-            mw.addonManager.writeConfig(__name__, self.cfg)
-        except Exception:
-            pass
+        self.quiz_widget.setStyleSheet(_quiz_stylesheet(self.qfontsize.value(), self.afontsize.value()))
+        self.settings.update({
+            "font_size_q": int(self.qfontsize.value()),
+            "font_size_a": int(self.afontsize.value()),
+        })
+
+    def done(self, result):
+        self.settings.flush()
+        super().done(result)
 
     def _on_card_type_select(self):
         sender = self.sender()
@@ -550,10 +1560,73 @@ class MCQuizDialog(QDialog):
             self.allCards.setChecked(False)
             self.allCards.blockSignals(False)
 
+    # ---- Deck tree ----
+    def _build_deck_tree(self, decks, selected_names):
+        # sorting by full name puts every parent before its children
+        for did, name in sorted(decks, key=lambda d: d[1]):
+            parts = name.split("::")
+            parent = self.deck_items.get("::".join(parts[:-1]))
+            item = QTreeWidgetItem(parent if parent is not None else self.deck_tree, [parts[-1]])
+            item.setData(0, Qt.ItemDataRole.UserRole, did)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable | Qt.ItemFlag.ItemIsAutoTristate)
+            item.setCheckState(0, Qt.CheckState.Unchecked)
+            self.deck_items[name] = item
+        for name in selected_names:
+            item = self.deck_items.get(name)
+            if item is not None:
+                item.setCheckState(0, Qt.CheckState.Checked)
+                parent = item.parent()
+                while parent is not None:
+                    parent.setExpanded(True)
+                    parent = parent.parent()
+
+    def _selected_decks(self):
+        """(did, full name) for every checked deck, subdecks of a checked parent included."""
+        return [(item.data(0, Qt.ItemDataRole.UserRole), name)
+                for name, item in self.deck_items.items()
+                if item.checkState(0) == Qt.CheckState.Checked]
+
+    def _selected_deck_roots(self):
+        """Checked decks whose parent is not checked, i.e. the names the user actually picked."""
+        checked = {name for _did, name in self._selected_decks()}
+        return [name for name in sorted(checked) if "::".join(name.split("::")[:-1]) not in checked]
+
+    def _on_deck_item_changed(self, _item, _column):
+        # toggling a parent emits itemChanged for every descendant; refresh once afterwards
+        if self._deck_refresh_pending:
+            return
+        self._deck_refresh_pending = True
+        QTimer.singleShot(0, self._on_decks_changed)
+
+    # ---- Exclude tags ----
+    def _on_tag_text_edited(self, text):
+        completions = _get_tag_index().complete(text.strip()) if text.strip() else []
+        self.tag_model.setStringList([tag for tag, _count in completions])
+
+    def _on_add_tag(self):
+        tag = self.tag_edit.text().strip()
+        if not tag:
+            return
+        index = _get_tag_index()
+        if index.unknown([tag]):
+            tooltip(f"No notes have the tag \"{tag}\".")
+            return
+        existing = {self.tags_list.item(i).text().lower() for i in range(self.tags_list.count())}
+        if tag.lower() not in existing:
+            self.tags_list.addItem(QListWidgetItem(tag))
+        self.tag_edit.clear()
+
+    def _on_remove_tag(self):
+        for item in self.tags_list.selectedItems():
+            self.tags_list.takeItem(self.tags_list.row(item))
+
     # ---- UI updates ----
-    def _on_deck_changed(self, deck_name):
-        nids = _find_notes_in_deck(self, deck_name, [])
+    def _on_decks_changed(self):
+        self._deck_refresh_pending = False
+        deck_ids = [did for did, _name in self._selected_decks()]
+        nids = _find_notes_in_decks(self, deck_ids)
         models = _collect_models_and_fields(nids)
+        self.deck_models = models
         self.model_cb.blockSignals(True)
         self.model_cb.clear()
         for mname in sorted(models.keys()):
@@ -566,10 +1639,8 @@ class MCQuizDialog(QDialog):
         self._populate_fields(deck_models=models)
 
     def _populate_fields(self, deck_models=None):
-        deck_name = self.deck_cb.currentText()
         if deck_models is None:
-            nids = _find_notes_in_deck(self, deck_name, [])
-            deck_models = _collect_models_and_fields(nids)
+            deck_models = self.deck_models
 
         mname = self.model_cb.currentText()
         fields = []
@@ -605,12 +1676,15 @@ class MCQuizDialog(QDialog):
 
     # ---- Quiz flow ----
     def start_quiz(self):
-        self.resize(QUESTIONS_WIDTH, QUESTIONS_HEIGHT)
-        deck = self.deck_cb.currentText()
-        exclude = [self.tags_list.item(i).text() for i in range(self.tags_list.count())]
+        selected_decks = self._selected_decks()
+        deck_ids = [did for did, _name in selected_decks]
+        deck = ", ".join(self._selected_deck_roots())
+        cross_deck = bool(self.cross_deck_cb.isChecked())
+        exclude = [t for t in (self.tags_list.item(i).text().strip() for i in range(self.tags_list.count())) if t]
         num_q = int(self.qcount.value())
         num_c = int(self.ccount.value())
         allow_dup = bool(self.dup_cb.isChecked())
+        typed = bool(self.typed_cb.isChecked())
         
         card_states = []
         if self.newCards.isChecked():
@@ -626,43 +1700,95 @@ class MCQuizDialog(QDialog):
         prompt_field = self.prompt_cb.currentText()
         answer_field = self.answer_cb.currentText()
 
-        nids = _find_notes_in_deck(self, deck, exclude)
-        if self.exclude_history_cb.isChecked():
-            used_nids = _load_history()
-            nids = [nid for nid in nids if nid not in used_nids]
-        qa = _notes_to_qa(nids, prompt_field, answer_field, required_model_name=model_name)
+        if not deck_ids:
+            QMessageBox.warning(self, "No deck selected", "Select at least one deck.")
+            return
+
+        qa = self._extract_qa(selected_decks, exclude, model_name, prompt_field, answer_field)
 
         if len(qa) == 0:
             QMessageBox.warning(self, "No matching notes",
-                                "No notes found with the chosen fields in this deck.\n"
-                                f"Deck: {deck}\nNote type: {model_name}\nFields: {prompt_field} / {answer_field}")
+                                "No notes found with the chosen fields in the selected decks.\n"
+                                f"Decks: {deck}\nNote type: {model_name}\nFields: {prompt_field} / {answer_field}")
             return
 
+        answer_index = _build_answer_index(qa)
+        if answer_index["accepted"]:
+            tooltip(f"{len(answer_index['accepted'])} notes share a prompt with a different answer; "
+                    "all of those answers are accepted. Use \"Find Ambiguous Notes\" to review them.")
+        distractor_stats = DistractorStats.load() if self.cfg["distractor_learning"] and not typed else None
         try:
-            quiz = _make_quiz_items(qa, num_q, num_c, allow_dup)
+            # typed mode only needs the correct answer on each item
+            quiz = _make_quiz_items(qa, num_q, 1 if typed else num_c, allow_dup, cross_deck, answer_index,
+                                    distractor_stats)
         except Exception as e:
             QMessageBox.warning(self, "Quiz error",
                                 f"Could not build quiz: {e}\n"
                                 f"Notes available: {len(qa)}")
             return
         
-        # persist choices
-        self.cfg["default_deck"] = deck
-        self.cfg["num_choices"] = num_c
-        self.cfg["num_questions"] = num_q
-        self.cfg["allow_answer_reuse"] = allow_dup
-        self.cfg["last_model_name"] = model_name
-        self.cfg["last_prompt_field"] = prompt_field
-        self.cfg["last_answer_field"] = answer_field
-        self.cfg["num_per_page"] = int(self.qperpage.value())
-        self.cfg["card_states"] = card_states
-        
-        try:
-            mw.addonManager.writeConfig(__name__, self.cfg)
-        except Exception:
-            pass
+        # persist choices (written when idle or on close)
+        self.settings.update({
+            "default_decks": self._selected_deck_roots(),
+            "cross_deck_distractors": cross_deck,
+            "num_choices": num_c,
+            "num_questions": num_q,
+            "allow_answer_reuse": allow_dup,
+            "typed_answers": typed,
+            "last_model_name": model_name,
+            "last_prompt_field": prompt_field,
+            "last_answer_field": answer_field,
+            "num_per_page": int(self.qperpage.value()),
+            "card_states": card_states,
+        })
 
-        random.shuffle(quiz)
+        # kept in memory so the results page can start a new quiz without touching the collection
+        session = {
+            "deck": deck,
+            "typed": typed,
+            "num_choices": 1 if typed else num_c,
+            "allow_answer_reuse": allow_dup,
+            "cross_deck": cross_deck,
+            "answer_index": answer_index,
+            "distractor_stats": distractor_stats,
+            "ngram_index": NgramIndex(quiz.text(aid) for aid in answer_index["pools"][None]) if typed else None,
+        }
+        self._begin_quiz(quiz, session)
+
+    def _extract_qa(self, selected_decks, exclude, model_name, prompt_field, answer_field):
+        deck_ids = [did for did, _name in selected_decks]
+        nids = _find_notes_in_decks(self, deck_ids)
+        if exclude:
+            unknown = _get_tag_index().unknown(exclude)
+            if unknown:
+                tooltip("Excluded tags not found in collection: " + ", ".join(unknown))
+            excluded = _get_tag_index().note_ids(exclude)
+            nids = [nid for nid in nids if nid not in excluded]
+        if self.exclude_history_cb.isChecked():
+            used_nids = _load_history()
+            nids = [nid for nid in nids if nid not in used_nids]
+        note_decks = _note_source_decks(nids, deck_ids)
+        return _notes_to_qa(nids, prompt_field, answer_field, required_model_name=model_name,
+                            note_decks=note_decks, deck_names=dict(selected_decks))
+
+    def _on_find_ambiguous(self):
+        selected_decks = self._selected_decks()
+        if not selected_decks:
+            QMessageBox.warning(self, "No deck selected", "Select at least one deck.")
+            return
+        exclude = [t for t in (self.tags_list.item(i).text().strip() for i in range(self.tags_list.count())) if t]
+        qa = self._extract_qa(selected_decks, exclude, self.model_cb.currentText(),
+                              self.prompt_cb.currentText(), self.answer_cb.currentText())
+        answer_index = _build_answer_index(qa)
+        if not answer_index["conflicts"]:
+            tooltip("No ambiguous prompts found.")
+            return
+        dlg = AmbiguityDialog(answer_index["conflicts"], answer_index["table"], self)
+        dlg.exec()
+
+    def _begin_quiz(self, quiz, session):
+        self.resize(QUESTIONS_WIDTH, QUESTIONS_HEIGHT)
+        random.shuffle(quiz.items)
         self.state = {
             "quiz": quiz,
             "idx": 0,
@@ -670,8 +1796,16 @@ class MCQuizDialog(QDialog):
             "total": len(quiz),
             "page": 0,
             "per_page": int(self.qperpage.value()),
+            "deck": session["deck"],
+            "typed": session["typed"],
+            "ngram_index": session["ngram_index"],
+            "session": session,
         }
         self.user_answers = {}
+        self.user_choices = {}
+        self.user_correct = {}
+        self.shown_at = {}
+        self.response_ms = {}
         self.config_widget.hide()
         self._show_current_page()
 
@@ -696,33 +1830,49 @@ class MCQuizDialog(QDialog):
 
         end = min(idx + per_page, total)
         self.page_option_rows = []
-        
-        self.qlabels = list()
-        self.alabels = list()
+        now = time.monotonic()
+        self.last_answer_at = now
+        for qidx in range(idx, end):
+            self.shown_at.setdefault(qidx, now)
 
         for i, qidx in enumerate(range(idx, end)):
             q = quiz[qidx]
             q_group = QVBoxLayout()
             group_widget = QGroupBox()
-            group_widget.setStyleSheet("QGroupBox { border: 2px solid #afafaf; border-radius: 10px; margin-top: 10px; padding: 10px; }")
+            group_widget.setProperty("quizResult", "pending")
             
-            q_label = QLabel(f"Q{qidx+1}: {_strip_html(q['prompt'])}")
-            q_label.setStyleSheet("font-size: " + str(self.qfontsize.value()) + "px;")
+            q_label = QLabel(f"Q{qidx+1}: {_strip_html(quiz.text(q.prompt_id))}")
+            q_label.setProperty("quizRole", "prompt")
             q_label.setWordWrap(True)
             q_label.setMaximumWidth(820)
             q_group.addWidget(q_label)
-            self.qlabels.append(q_label)
+
+            if self.state.get("typed"):
+                typed_row = TypedAnswerRow(self)
+                typed_row.setProperty("quizRole", "answer")
+                submit = partial(self._on_submit_typed, i, typed_row, group_widget)
+                typed_row.edit.returnPressed.connect(submit)
+                typed_row.check_btn.clicked.connect(submit)
+                q_group.addWidget(typed_row)
+                self.current_question_widgets.append(typed_row)
+                self.page_option_rows.append([])
+
+                group_widget.setLayout(q_group)
+                group_widget.setSizePolicy(QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Fixed)
+                self.quiz_container.addWidget(group_widget)
+                self.current_question_widgets.append(q_label)
+                self.current_question_widgets.append(group_widget)
+                continue
 
             rows = []
-            for opt in q["options"]:
-                row = OptionRow(opt, self)
-                row.setStyleSheet("font-size: " + str(self.cfg["font_size_a"]) + "px;")
+            for j, aid in enumerate(q.option_ids):
+                row = OptionRow(quiz.text(aid), self)
+                row.setProperty("quizRole", "answer")
                 # clicking the radio selects and finalizes the question
-                row.radio.toggled.connect(partial(self._on_choose, i, row, group_widget))
+                row.radio.toggled.connect(partial(self._on_choose, i, j, row, group_widget))
                 q_group.addWidget(row)
                 rows.append(row)
                 self.current_question_widgets.append(row)
-                self.alabels.append(row)
             self.page_option_rows.append(rows)
 
             group_widget.setLayout(q_group)
@@ -749,7 +1899,7 @@ class MCQuizDialog(QDialog):
         # --- Auto-scroll to top ---
         self.scroll_area.verticalScrollBar().setValue(0)
 
-    def _on_choose(self, question_idx_in_page, chosen_row: OptionRow, group_widget: QGroupBox, checked: bool):
+    def _on_choose(self, question_idx_in_page, option_idx, chosen_row: OptionRow, group_widget: QGroupBox, checked: bool):
         if not checked:
             return
         quiz = self.state["quiz"]
@@ -759,35 +1909,86 @@ class MCQuizDialog(QDialog):
             return  # already answered
 
         q = quiz[qidx]
-        chosen_raw = chosen_row.raw_html
-        correct_raw = q["correct"]
 
         # record
-        self.user_answers[qidx] = chosen_raw
+        now = time.monotonic()
+        self.user_answers[qidx] = chosen_row.raw_html
+        self.user_choices[qidx] = option_idx
+        self.user_correct[qidx] = quiz.is_correct(q, option_idx)
+        # with several questions per page, time from the previous answer rather than page load
+        self.response_ms[qidx] = int(1000 * (now - max(self.shown_at.get(qidx, now), self.last_answer_at)))
+        self.last_answer_at = now
 
         # peer rows for this question
         rows = self.page_option_rows[question_idx_in_page]
         # lock and colorize
         
         isCorrect = True
-        for row in rows:
+        for j, row in enumerate(rows):
             row.radio.setEnabled(False)
             row.label.mousePressEvent = lambda event: event.ignore()
             
-            if _normalize_html(row.raw_html) == _normalize_html(correct_raw):
+            if quiz.is_correct(q, j):
                 row.radio.setText("✔")
-                row.radio.setStyleSheet("QRadioButton { color: green; }")
+                _set_style_state(row.radio, "quizMark", "correct")
             elif row is chosen_row:
                 row.radio.setText("✘")
-                row.radio.setStyleSheet("QRadioButton { color: red; }")
+                _set_style_state(row.radio, "quizMark", "wrong")
                 isCorrect = False
         
-        if isCorrect:
-            group_widget.setStyleSheet("QGroupBox { border: 2px solid green; border-radius: 10px; margin-top: 10px; padding: 10px; }")
-        else:
-            group_widget.setStyleSheet("QGroupBox { border: 2px solid red; border-radius: 10px; margin-top: 10px; padding: 10px; }")
+        _set_style_state(group_widget, "quizResult", "correct" if isCorrect else "wrong")
         
-        if _normalize_html(chosen_raw) == _normalize_html(correct_raw):
+        if self.user_correct[qidx]:
+            self.state["correct"] += 1
+
+    def _on_submit_typed(self, question_idx_in_page, row: TypedAnswerRow, group_widget: QGroupBox, *_args):
+        typed_text = row.edit.text().strip()
+        if not typed_text:
+            return
+        idx = self.state["idx"]
+        qidx = idx + question_idx_in_page
+        if qidx in self.user_answers:
+            return  # already answered
+
+        quiz = self.state["quiz"]
+        q = quiz[qidx]
+        correct_raw = quiz.text(q.correct_id)
+        accepted, dist = False, None
+        for aid in quiz.accepted_ids(q):
+            accepted, dist = _grade_typed(typed_text, quiz.text(aid),
+                                          self.cfg["typed_max_distance"], self.cfg["typed_max_ratio"])
+            if accepted:
+                break
+
+        now = time.monotonic()
+        self.user_answers[qidx] = typed_text
+        self.user_correct[qidx] = accepted
+        self.response_ms[qidx] = int(1000 * (now - max(self.shown_at.get(qidx, now), self.last_answer_at)))
+        self.last_answer_at = now
+        row.lock()
+
+        correct_txt = _strip_html(correct_raw)
+        if accepted and dist:
+            row.show_feedback(f"<span style='color:green'>✔ Accepted (close match): {correct_txt}</span>")
+        elif accepted:
+            row.show_feedback("<span style='color:green'>✔ Correct</span>")
+        else:
+            feedback = f"<span style='color:red'>✘ Correct answer: {correct_txt}</span>"
+            alternates = quiz.accepted_ids(q)[1:]
+            if alternates:
+                feedback += "<br><i>Also accepted: " + ", ".join(_strip_html(quiz.text(a)) for a in alternates) + "</i>"
+            suggestions = []
+            index = self.state.get("ngram_index")
+            if index is not None:
+                accepted_forms = {_canonical_answer(quiz.text(a)) for a in quiz.accepted_ids(q)}
+                suggestions = [sug for sug in index.suggest(typed_text, self.cfg["typed_max_distance"])
+                               if _canonical_answer(sug) not in accepted_forms]
+            if suggestions:
+                feedback += "<br><i>Did you mean: " + ", ".join(_strip_html(sug) for sug in suggestions) + "?</i>"
+            row.show_feedback(feedback)
+
+        _set_style_state(group_widget, "quizResult", "correct" if accepted else "wrong")
+        if accepted:
             self.state["correct"] += 1
 
     def _on_next_page(self):
@@ -815,9 +2016,9 @@ class MCQuizDialog(QDialog):
         for i, q in enumerate(quiz):
             ua_raw = self.user_answers.get(i, "")
             ua_txt = _strip_html(ua_raw)
-            ca_txt = _strip_html(q["correct"])
-            color = "#cfc" if _normalize_html(ua_raw) == _normalize_html(q["correct"]) else "#fcc"
-            prompt_txt = _strip_html(q["prompt"])
+            ca_txt = _strip_html(quiz.text(q.correct_id))
+            color = "#cfc" if self.user_correct.get(i) else "#fcc"
+            prompt_txt = _strip_html(quiz.text(q.prompt_id))
             html += f"<tr style='color:black;background:{color};'><td>{i+1}</td><td>{prompt_txt}</td><td>{ua_txt}</td><td>{ca_txt}</td></tr>"
         html += "</table>"
 
@@ -828,14 +2029,64 @@ class MCQuizDialog(QDialog):
         self.quiz_container.addWidget(results_label)
         self.current_question_widgets.append(results_label)
 
+        missed = total - sum(1 for i in range(total) if self.user_correct.get(i))
+        retry_missed_btn = QPushButton(f"Retry Missed Questions ({missed})")
+        retry_missed_btn.setEnabled(missed > 0)
+        retry_missed_btn.clicked.connect(self._on_retry_missed)
+        self.quiz_container.addWidget(retry_missed_btn)
+        self.current_question_widgets.append(retry_missed_btn)
+
+        requiz_btn = QPushButton("Re-quiz Same Questions" if self.state.get("typed") else "Re-quiz With New Distractors")
+        requiz_btn.clicked.connect(self._on_requiz)
+        self.quiz_container.addWidget(requiz_btn)
+        self.current_question_widgets.append(requiz_btn)
+
         export_btn = QPushButton("Export Results to HTML")
         export_btn.clicked.connect(self._export_results_html)
         self.quiz_container.addWidget(export_btn)
         self.current_question_widgets.append(export_btn)
 
-        _save_history([q["nid"] for q in quiz])
+        _save_history([q.nid for q in quiz])
+        try:
+            _record_quiz_stats([
+                {
+                    "nid": q.nid,
+                    "correct": bool(self.user_correct.get(i)),
+                    "chosen": self.user_answers.get(i),
+                    "ms": self.response_ms.get(i),
+                    "deck": quiz.deck(q) or self.state.get("deck", ""),
+                    "tags": quiz.tags(q),
+                    "model": quiz.model(q),
+                }
+                for i, q in enumerate(quiz)
+            ])
+        except Exception as e:
+            tooltip(f"Error saving quiz statistics: {e}")
+        self._record_distractors()
         self.config_widget.show()
 
+    def _record_distractors(self):
+        session = self.state.get("session") or {}
+        distractor_stats = session.get("distractor_stats")
+        if distractor_stats is None:
+            return
+        quiz = self.state["quiz"]
+        answer_nids = session["answer_index"]["answer_nids"]
+        distractor_stats.tick()
+        for qidx, choice in self.user_choices.items():
+            q = quiz[qidx]
+            shown = []
+            for j, aid in enumerate(q.option_ids):
+                dnid = answer_nids.get(aid)
+                if not quiz.is_correct(q, j) and dnid is not None and dnid != q.nid:
+                    shown.append(dnid)
+            # with answer reuse a distractor can fill several slots; count it once per showing
+            distractor_stats.record(q.nid, list(dict.fromkeys(shown)), answer_nids.get(q.option_ids[choice]))
+        try:
+            distractor_stats.save()
+        except Exception as e:
+            tooltip(f"Error saving distractor statistics: {e}")
+
     def _export_results_html(self):
         quiz = self.state["quiz"]
         total = self.state["total"]
@@ -847,9 +2098,9 @@ class MCQuizDialog(QDialog):
         for i, q in enumerate(quiz):
             ua_raw = self.user_answers.get(i, "")
             ua_txt = _strip_html(ua_raw)
-            ca_txt = _strip_html(q["correct"])
-            color = "#cfc" if _normalize_html(ua_raw) == _normalize_html(q["correct"]) else "#fcc"
-            prompt_txt = _strip_html(q["prompt"])
+            ca_txt = _strip_html(quiz.text(q.correct_id))
+            color = "#cfc" if self.user_correct.get(i) else "#fcc"
+            prompt_txt = _strip_html(quiz.text(q.prompt_id))
             html += f"<tr style='background:{color}'><td>{i+1}</td><td>{prompt_txt}</td><td>{ua_txt}</td><td>{ca_txt}</td></tr>"
         html += "</table>"
 
@@ -864,9 +2115,26 @@ class MCQuizDialog(QDialog):
         self.quiz_container.addWidget(retry_btn)
         self.current_question_widgets.append(retry_btn)
 
+    def _requiz_from_session(self, questions):
+        """Start a new quiz over questions of the finished one, with new options from the session's answer index."""
+        session = self.state.get("session")
+        if not session or not questions:
+            return
+        quiz = _requiz_items(questions, session["num_choices"], session["allow_answer_reuse"],
+                             session["cross_deck"], session["answer_index"], session["distractor_stats"])
+        self._begin_quiz(quiz, session)
+
+    def _on_retry_missed(self):
+        quiz = self.state["quiz"]
+        self._requiz_from_session([q for i, q in enumerate(quiz) if not self.user_correct.get(i)])
+
+    def _on_requiz(self):
+        self._requiz_from_session(list(self.state["quiz"]))
+
     def retry_quiz(self):
         self.state = {"quiz": [], "idx": 0, "correct": 0, "total": 0, "page": 0, "per_page": 5}
         self.user_answers = {}
+        self.user_correct = {}
         self.config_widget.show()
         self.next_btn.hide()
         self.prev_btn.hide()
@@ -881,10 +2149,22 @@ class MCQuizDialog(QDialog):
             except Exception as e:
                 tooltip(f"Error clearing quiz history: {e}")
 
+    def _on_show_analytics(self):
+        dlg = AnalyticsDialog(self)
+        dlg.exec()
+
 def show_quiz_dialog():
     dlg = MCQuizDialog(mw)
     dlg.exec()
 
+gui_hooks.operation_did_execute.append(_on_operation_did_execute)
+gui_hooks.profile_will_close.append(_on_profile_will_close)
+gui_hooks.sync_did_finish.append(_on_tag_index_invalidated)
+if hasattr(gui_hooks, "state_did_undo"):
+    gui_hooks.state_did_undo.append(_on_tag_index_invalidated)
+if hasattr(anki_hooks, "notes_will_be_deleted"):
+    anki_hooks.notes_will_be_deleted.append(_on_notes_will_be_deleted)
+
 action = QAction("Automated Quizzes", mw)
 action.triggered.connect(show_quiz_dialog)
 mw.form.menuTools.addAction(action)